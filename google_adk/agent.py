@@ -10,23 +10,29 @@ from google.adk.a2a.utils.agent_to_a2a import to_a2a
 from google.genai import types
 from google.adk.models.lite_llm import LiteLlm
 from dotenv import load_dotenv
+import ast
+import functools
+import httpx
+import litellm
+import operator
 import os
 import logging
+import math
+import msgspec
 from fastapi import Request
-from opentelemetry import trace
-from opentelemetry.context import set_value, attach
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-
-# Import custom OpenTelemetry components
-from utils.otel_exporter import (
-    TraceModifyingSpanProcessor,
-    ModifyingSpanExporter,
-)
+from opentelemetry import baggage, trace
+from opentelemetry.context import attach, detach
+from opentelemetry.propagate import extract
 
 load_dotenv()
 
+# Tracing can be switched off (e.g. for tests or latency-sensitive runs) with ENABLE_TRACING=0.
+# When disabled, the OpenTelemetry SDK and exporter are never imported.
+tracing_enabled = os.getenv("ENABLE_TRACING", "1") == "1"
+
+# Set once _init_tracing() has installed the TracerProvider in this process
+_tracing_initialized = False
+
 # Set up logging for OpenTelemetry debugging
 logging.basicConfig(
     level=logging.INFO,
@@ -36,103 +42,244 @@ logger = logging.getLogger(__name__)
 otel_logger = logging.getLogger("opentelemetry")
 otel_logger.setLevel(logging.DEBUG)  # Enable detailed OTEL logging
 
-# Configure OpenTelemetry tracing directly to LangSmith
-# Project name can be overridden via LANGSMITH_PROJECT environment variable
-project_name = os.getenv("LANGSMITH_PROJECT", "agent2agent")
-langsmith_api_key = os.getenv("LANGSMITH_API_KEY")
+# Module-level tracer; it delegates to the provider installed later by _init_tracing()
+tracer = trace.get_tracer(__name__)
 
-# Get LangSmith endpoint from environment or use default
-# For EU region, use: https://eu.api.smith.langchain.com/otel/v1/traces
-langsmith_endpoint = os.getenv(
-    "OTEL_EXPORTER_OTLP_ENDPOINT",
-    "https://api.smith.langchain.com/otel/v1/traces"
-)
 
-logger.info("=" * 60)
-logger.info("Configuring OpenTelemetry for LangSmith")
-logger.info(f"Endpoint: {langsmith_endpoint}")
-logger.info(f"Project: {project_name}")
-
-# Build headers for LangSmith
-# Priority: OTEL_EXPORTER_OTLP_HEADERS env var > individual env vars
-headers = {}
-
-# Check if OTEL_EXPORTER_OTLP_HEADERS is set (takes precedence)
-env_headers = os.getenv("OTEL_EXPORTER_OTLP_HEADERS", "")
-if env_headers:
-    logger.info("Using OTEL_EXPORTER_OTLP_HEADERS from environment")
-    # Parse headers from environment variable
-    # Format: "key1=value1,key2=value2" or "key1: value1,key2: value2"
-    for header_pair in env_headers.split(","):
-        header_pair = header_pair.strip()
-        if "=" in header_pair:
-            key, value = header_pair.split("=", 1)
-            headers[key.strip()] = value.strip()
-            # Don't log the full API key value
-            if "api" in key.lower() and "key" in key.lower():
-                logger.info(f"  Header: {key.strip()}=***")
-            else:
-                logger.info(f"  Header: {key.strip()}={value.strip()}")
-        elif ":" in header_pair:
-            key, value = header_pair.split(":", 1)
-            headers[key.strip()] = value.strip()
-            if "api" in key.lower() and "key" in key.lower():
-                logger.info(f"  Header: {key.strip()}=***")
-            else:
-                logger.info(f"  Header: {key.strip()}={value.strip()}")
-else:
-    logger.info("Using individual environment variables (LANGSMITH_API_KEY, LANGSMITH_PROJECT)")
-    # Fall back to individual environment variables if OTEL_EXPORTER_OTLP_HEADERS not set
-    if langsmith_api_key:
-        headers["x-api-key"] = langsmith_api_key
-        logger.info("  Header: x-api-key=*** (from LANGSMITH_API_KEY)")
+def _init_tracing():
+    """Configure OpenTelemetry tracing to LangSmith for this process.
+
+    Runs from the app's startup hook so each uvicorn worker owns its own
+    TracerProvider and BatchSpanProcessor export thread. Safe to call more than
+    once - later calls are no-ops, so exporters and threads are never duplicated.
+    """
+    global _tracing_initialized
+    if _tracing_initialized:
+        return
+    if not tracing_enabled:
+        logger.info("Tracing disabled (ENABLE_TRACING != 1), skipping OpenTelemetry setup")
+        return
+
+    # Imported here so the SDK and exporter load only when tracing is enabled
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    # Import custom OpenTelemetry components
+    from utils.otel_exporter import (
+        ThreadIdBaggageSpanProcessor,
+        TraceModifyingSpanProcessor,
+        ModifyingSpanExporter,
+    )
+
+    # Configure OpenTelemetry tracing directly to LangSmith
+    # Project name can be overridden via LANGSMITH_PROJECT environment variable
+    project_name = os.getenv("LANGSMITH_PROJECT", "agent2agent")
+    langsmith_api_key = os.getenv("LANGSMITH_API_KEY")
+
+    # Get LangSmith endpoint from environment or use default
+    # For EU region, use: https://eu.api.smith.langchain.com/otel/v1/traces
+    langsmith_endpoint = os.getenv(
+        "OTEL_EXPORTER_OTLP_ENDPOINT",
+        "https://api.smith.langchain.com/otel/v1/traces"
+    )
+
+    logger.info("=" * 60)
+    logger.info("Configuring OpenTelemetry for LangSmith")
+    logger.info(f"Endpoint: {langsmith_endpoint}")
+    logger.info(f"Project: {project_name}")
+
+    # Build headers for LangSmith
+    # Priority: OTEL_EXPORTER_OTLP_HEADERS env var > individual env vars
+    headers = {}
+
+    # Check if OTEL_EXPORTER_OTLP_HEADERS is set (takes precedence)
+    env_headers = os.getenv("OTEL_EXPORTER_OTLP_HEADERS", "")
+    if env_headers:
+        logger.info("Using OTEL_EXPORTER_OTLP_HEADERS from environment")
+        # Parse headers from environment variable
+        # Format: "key1=value1,key2=value2" or "key1: value1,key2: value2"
+        for header_pair in env_headers.split(","):
+            header_pair = header_pair.strip()
+            if "=" in header_pair:
+                key, value = header_pair.split("=", 1)
+                headers[key.strip()] = value.strip()
+                # Don't log the full API key value
+                if "api" in key.lower() and "key" in key.lower():
+                    logger.info(f"  Header: {key.strip()}=***")
+                else:
+                    logger.info(f"  Header: {key.strip()}={value.strip()}")
+            elif ":" in header_pair:
+                key, value = header_pair.split(":", 1)
+                headers[key.strip()] = value.strip()
+                if "api" in key.lower() and "key" in key.lower():
+                    logger.info(f"  Header: {key.strip()}=***")
+                else:
+                    logger.info(f"  Header: {key.strip()}={value.strip()}")
     else:
-        logger.warning("  WARNING: LANGSMITH_API_KEY not set!")
-    if project_name:
-        headers["Langsmith-Project"] = project_name
-        logger.info(f"  Header: Langsmith-Project={project_name}")
-
-if not headers:
-    logger.error("ERROR: No headers configured! Traces will not be sent to LangSmith.")
-    logger.error("Please set either:")
-    logger.error("  - OTEL_EXPORTER_OTLP_HEADERS='x-api-key=YOUR_KEY,Langsmith-Project=YOUR_PROJECT'")
-    logger.error("  - OR set LANGSMITH_API_KEY and LANGSMITH_PROJECT environment variables")
-
-# Create the OTLP exporter for LangSmith
-logger.info("Creating OTLPSpanExporter...")
-otlp_exporter = OTLPSpanExporter(
-    endpoint=langsmith_endpoint,
-    headers=headers if headers else None,
-    timeout=10,
-)
+        logger.info("Using individual environment variables (LANGSMITH_API_KEY, LANGSMITH_PROJECT)")
+        # Fall back to individual environment variables if OTEL_EXPORTER_OTLP_HEADERS not set
+        if langsmith_api_key:
+            headers["x-api-key"] = langsmith_api_key
+            logger.info("  Header: x-api-key=*** (from LANGSMITH_API_KEY)")
+        else:
+            logger.warning("  WARNING: LANGSMITH_API_KEY not set!")
+        if project_name:
+            headers["Langsmith-Project"] = project_name
+            logger.info(f"  Header: Langsmith-Project={project_name}")
+
+    if not headers:
+        logger.error("ERROR: No headers configured! Traces will not be sent to LangSmith.")
+        logger.error("Please set either:")
+        logger.error("  - OTEL_EXPORTER_OTLP_HEADERS='x-api-key=YOUR_KEY,Langsmith-Project=YOUR_PROJECT'")
+        logger.error("  - OR set LANGSMITH_API_KEY and LANGSMITH_PROJECT environment variables")
+
+    # Create the OTLP exporter for LangSmith
+    logger.info("Creating OTLPSpanExporter...")
+    otlp_exporter = OTLPSpanExporter(
+        endpoint=langsmith_endpoint,
+        headers=headers if headers else None,
+        timeout=10,
+    )
+
+    # Configure span filtering patterns from environment variable
+    # Format: comma-separated regex patterns, e.g., "a2a\.server.*,a2a\.utils.*,EventQueue\..*"
+    # Default: Filter out a2a.server and a2a.utils spans
+    filter_patterns_str = os.getenv("OTEL_SPAN_FILTER_PATTERNS", "a2a\\.server.*,a2a\\.utils.*")
+    filter_patterns_list = [p.strip() for p in filter_patterns_str.split(",") if p.strip()]
+
+    # Wrap the exporter with our custom modifying exporter
+    # This allows us to filter or log traces before they are sent to LangSmith
+    # The exporter will compile the pattern strings internally
+    logger.info("Wrapping exporter with ModifyingSpanExporter...")
+    modifying_exporter = ModifyingSpanExporter(otlp_exporter, filter_patterns=filter_patterns_list)
+
+    # Configure head sampling from environment variable
+    # Ratio of new traces to record (0.0-1.0); sampled parent contexts are always respected
+    # Default: 1.0 (record every trace). Lower it under high load, e.g. TRACE_SAMPLE_RATIO=0.1
+    trace_sample_ratio = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+    logger.info(f"Trace sample ratio: {trace_sample_ratio}")
+
+    # Set up the TracerProvider with our custom processor and exporter
+    logger.info("Setting up TracerProvider with TraceModifyingSpanProcessor and BatchSpanProcessor...")
+    tracer_provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(trace_sample_ratio)))
+
+    # Tag every span with the thread_id propagated as baggage (runs when spans start)
+    tracer_provider.add_span_processor(ThreadIdBaggageSpanProcessor())
+
+    # Add the modifying span processor FIRST (modifies spans when they end)
+    modifying_processor = TraceModifyingSpanProcessor()
+    tracer_provider.add_span_processor(modifying_processor)
+
+    # Add the batch processor with our modifying exporter SECOND (exports to LangSmith)
+    # Export runs on the processor's background thread; a deep queue and a longer
+    # schedule delay keep the request path from ever waiting on LangSmith.
+    # Standard OTEL_BSP_* environment variables override these defaults.
+    batch_processor = BatchSpanProcessor(
+        modifying_exporter,
+        max_queue_size=int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "8192")),
+        schedule_delay_millis=int(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "2000")),
+        max_export_batch_size=int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")),
+    )
+    tracer_provider.add_span_processor(batch_processor)
+
+    trace.set_tracer_provider(tracer_provider)
+    _tracing_initialized = True
+    logger.info("OpenTelemetry configuration complete!")
+    logger.info("=" * 60)
+
+
+# Largest integer power the calculate tool will compute (~3,000 decimal digits)
+_MAX_POWER_BITS = 10_000
+
+
+def _checked_pow(base, exponent, modulus=None):
+    """pow() that refuses integer results too large to compute quickly."""
+    if (
+        modulus is None
+        and isinstance(base, int)
+        and isinstance(exponent, int)
+        and exponent > 0
+        and abs(base) > 1
+        and exponent * math.log2(abs(base)) > _MAX_POWER_BITS
+    ):
+        raise ValueError("result is too large")
+    if modulus is None:
+        return pow(base, exponent)
+    return pow(base, exponent, modulus)
+
+
+# round() digits the calculate tool accepts; large negative values are slow on integers
+_MAX_ROUND_DIGITS = 100
 
-# Configure span filtering patterns from environment variable
-# Format: comma-separated regex patterns, e.g., "a2a\.server.*,a2a\.utils.*,EventQueue\..*"
-# Default: Filter out a2a.server and a2a.utils spans
-filter_patterns_str = os.getenv("OTEL_SPAN_FILTER_PATTERNS", "a2a\\.server.*,a2a\\.utils.*")
-filter_patterns_list = [p.strip() for p in filter_patterns_str.split(",") if p.strip()]
 
-# Wrap the exporter with our custom modifying exporter
-# This allows us to filter or log traces before they are sent to LangSmith
-# The exporter will compile the pattern strings internally
-logger.info("Wrapping exporter with ModifyingSpanExporter...")
-modifying_exporter = ModifyingSpanExporter(otlp_exporter, filter_patterns=filter_patterns_list)
+def _checked_round(number, ndigits=None):
+    """round() that refuses ndigits outside a small range."""
+    if isinstance(ndigits, int) and abs(ndigits) > _MAX_ROUND_DIGITS:
+        raise ValueError(f"ndigits must be between -{_MAX_ROUND_DIGITS} and {_MAX_ROUND_DIGITS}")
+    if ndigits is None:
+        return round(number)
+    return round(number, ndigits)
 
-# Set up the TracerProvider with our custom processor and exporter
-logger.info("Setting up TracerProvider with TraceModifyingSpanProcessor and BatchSpanProcessor...")
-tracer_provider = TracerProvider()
 
-# Add the modifying span processor FIRST (modifies spans when they end)
-modifying_processor = TraceModifyingSpanProcessor()
-tracer_provider.add_span_processor(modifying_processor)
+# Names and operators the calculate tool may use
+_CALCULATOR_FUNCTIONS = {
+    "abs": abs,
+    "round": _checked_round,
+    "min": min,
+    "max": max,
+    "sum": sum,
+    "pow": _checked_pow,
+}
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _checked_pow,
+}
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
 
-# Add the batch processor with our modifying exporter SECOND (exports to LangSmith)
-batch_processor = BatchSpanProcessor(modifying_exporter)
-tracer_provider.add_span_processor(batch_processor)
 
-trace.set_tracer_provider(tracer_provider)
-logger.info("OpenTelemetry configuration complete!")
-logger.info("=" * 60)
+def _eval_node(node: ast.AST):
+    """Evaluate a whitelisted arithmetic AST node."""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, complex):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _eval_node(node.left), _eval_node(node.right)
+        # Operators are for numbers only; this also blocks repeating lists with *
+        if isinstance(left, (list, tuple)) or isinstance(right, (list, tuple)):
+            raise ValueError("operators only accept numbers")
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_eval_node(node.operand))
+    if isinstance(node, ast.List):
+        return [_eval_node(element) for element in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(_eval_node(element) for element in node.elts)
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in _CALCULATOR_FUNCTIONS
+        and all(keyword.arg for keyword in node.keywords)
+    ):
+        args = [_eval_node(arg) for arg in node.args]
+        kwargs = {keyword.arg: _eval_node(keyword.value) for keyword in node.keywords}
+        return _CALCULATOR_FUNCTIONS[node.func.id](*args, **kwargs)
+    raise ValueError(f"unsupported syntax: {type(node).__name__}")
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse(expression: str) -> ast.expr:
+    """Parse an expression, caching the AST for repeated expressions."""
+    return ast.parse(expression.strip(), mode="eval").body
+
 
 def calculate(expression: str) -> str:
     """Evaluate a mathematical expression safely.
@@ -144,95 +291,176 @@ def calculate(expression: str) -> str:
         A string with the result of the calculation or an error message.
     """
     try:
-        # Use eval with a restricted namespace for basic math operations
-        allowed_names = {
-            "__builtins__": {},
-            "abs": abs,
-            "round": round,
-            "min": min,
-            "max": max,
-            "sum": sum,
-            "pow": pow,
-        }
-        result = eval(expression, allowed_names)
+        # Walk the parsed AST instead of calling eval, allowing only basic math
+        result = _eval_node(_parse(expression))
         return f"The result is: {result}"
     except Exception as e:
         return f"Error calculating expression: {str(e)}"
 
 
-llm = LiteLlm(
-    model="openai/gpt-4o",
-    api_base="https://api.openai.com/v1",
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+def _open_llm_http_client():
+    """Give LiteLLM one pooled HTTP client so OpenAI calls reuse keep-alive connections."""
+    litellm.aclient_session = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=500, max_keepalive_connections=200),
+        timeout=httpx.Timeout(600.0),
+    )
+
+
+async def _close_llm_http_client():
+    """Close the shared LiteLLM HTTP client on shutdown."""
+    if litellm.aclient_session is not None:
+        await litellm.aclient_session.aclose()
+        litellm.aclient_session = None
+
+
+def get_llm() -> LiteLlm:
+    """Create the LiteLlm model used by the agent."""
+    return LiteLlm(
+        model="openai/gpt-4o",
+        api_base="https://api.openai.com/v1",
+        api_key=os.getenv("OPENAI_API_KEY"),
+    )
 
-# Create the agent
-root_agent = Agent(
-    model=llm,
-    name="calculator_agent",
-    description="A simple calculator agent that can perform basic mathematical operations.",
-    instruction="""
-        You are a helpful calculator assistant. When users ask you to perform calculations,
-        use the calculate tool with a mathematical expression as a string.
+
+def build_agent() -> Agent:
+    """Create the calculator agent."""
+    return Agent(
+        model=get_llm(),
+        name="calculator_agent",
+        description="A simple calculator agent that can perform basic mathematical operations.",
+        instruction="""
+            You are a helpful calculator assistant. When users ask you to perform calculations,
+            use the calculate tool with a mathematical expression as a string.
         
-        Examples:
-        - "What is 5 + 3?" -> call calculate("5 + 3")
-        - "Calculate 10 * 7" -> call calculate("10 * 7")
-        - "What's 100 / 4?" -> call calculate("100 / 4")
+            Examples:
+            - "What is 5 + 3?" -> call calculate("5 + 3")
+            - "Calculate 10 * 7" -> call calculate("10 * 7")
+            - "What's 100 / 4?" -> call calculate("100 / 4")
         
-        Always use the calculate tool for any mathematical operations. Be friendly and clear
-        in your responses.
-    """,
-    tools=[calculate],
-    generate_content_config=types.GenerateContentConfig(
-        temperature=0.7,
-    ),
-)
+            Always use the calculate tool for any mathematical operations. Be friendly and clear
+            in your responses.
+        """,
+        tools=[calculate],
+        generate_content_config=types.GenerateContentConfig(
+            temperature=0.7,
+        ),
+    )
+
+
+# Create the agent (to_a2a() needs it up front, so it is built at import time)
+root_agent = build_agent()
 
 # Expose the agent via A2A protocol
 # This creates an A2A-compatible FastAPI app that can be served with uvicorn
-a2a_app = to_a2a(root_agent, port=8002)
+# The agent card advertises PUBLIC_HOST; HOST is only the address uvicorn binds to,
+# since a bind address such as 0.0.0.0 is not reachable by clients
+public_host = os.getenv("PUBLIC_HOST", "localhost")
+a2a_app = to_a2a(root_agent, host=public_host, port=8002)
+
+# Initialize tracing and the LLM HTTP client in each server process rather than at import time
+a2a_app.add_event_handler("startup", _init_tracing)
+a2a_app.add_event_handler("startup", _open_llm_http_client)
+a2a_app.add_event_handler("shutdown", _close_llm_http_client)
+
+# Bodies larger than this are not buffered just to look up thread_id
+MAX_THREAD_ID_BODY_BYTES = 1024 * 1024
+
+# Path of the JSON-RPC endpoint registered by to_a2a()
+JSON_RPC_PATH = "/"
+
+
+def _should_parse_body(request: Request) -> bool:
+    """Return True if the request may carry JSON-RPC metadata worth parsing."""
+    if request.method != "POST" or request.url.path != JSON_RPC_PATH:
+        return False
+    if not request.headers.get("content-type", "").startswith("application/json"):
+        return False
+    # Without Content-Length (e.g. chunked uploads) the size is unknown, so don't buffer
+    content_length = request.headers.get("content-length", "")
+    if not content_length.isdigit() or int(content_length) > MAX_THREAD_ID_BODY_BYTES:
+        return False
+    return True
+
+
+class _RequestMetadata(msgspec.Struct):
+    thread_id: str | None = None
+
+
+class _JsonRpcEnvelope(msgspec.Struct):
+    """The only part of an A2A JSON-RPC request the middleware needs; other fields are skipped."""
+    metadata: _RequestMetadata | None = None
+
+
+_envelope_decoder = msgspec.json.Decoder(_JsonRpcEnvelope)
+
+
+def _extract_thread_id(body_bytes: bytes) -> str | None:
+    """Pull the top-level metadata.thread_id out of a JSON-RPC body.
+
+    The schema-driven decode materializes metadata only and skips the message
+    payload, so nested metadata objects (e.g. params.message.metadata) are ignored.
+    """
+    if b'"thread_id"' not in body_bytes:
+        return None
+    envelope = _envelope_decoder.decode(body_bytes)
+    if envelope.metadata:
+        return envelope.metadata.thread_id
+    return None
+
 
 # Add middleware to extract session_id from metadata and set as thread_id in OpenTelemetry
 @a2a_app.middleware("http")
 async def set_thread_id_middleware(request: Request, call_next):
     """Extract session_id from metadata and set as thread_id in OpenTelemetry spans."""
-    tracer = trace.get_tracer(__name__)
+    if not tracing_enabled:
+        return await call_next(request)
     
-    thread_id = None
-    if request.method == "POST":
+    # Fast path: clients can send the thread_id as a header so the body is never buffered
+    thread_id = request.headers.get("x-thread-id")
+    if not thread_id and _should_parse_body(request):
         try:
+            # BaseHTTPMiddleware caches the body and replays it to the downstream app
             body_bytes = await request.body()
             if body_bytes:
-                import json
-                body = json.loads(body_bytes)
-                if "metadata" in body:
-                    thread_id = body["metadata"].get("thread_id")
-                async def receive():
-                    return {"type": "http.request", "body": body_bytes}
-                request._receive = receive
+                thread_id = _extract_thread_id(body_bytes)
         except:
             pass
     
+    # Continue any inbound trace context and carry thread_id as baggage so
+    # every span started for this request inherits it
+    ctx = extract(request.headers)
     if thread_id:
-        ctx = set_value("thread_id", thread_id)
-        token = attach(ctx)
-    else:
-        token = None
+        ctx = baggage.set_baggage("thread_id", thread_id, context=ctx)
+    token = attach(ctx)
     
     try:
         logger.info(f"Creating span 'google_adk_agent' for {request.method} {request.url.path}")
         with tracer.start_as_current_span("google_adk_agent") as span:
             logger.debug(f"Span created: trace_id={span.get_span_context().trace_id:x}, span_id={span.get_span_context().span_id:x}")
             if thread_id:
-                span.set_attribute("langsmith.metadata.thread_id", thread_id)
-                logger.info(f"Set thread_id attribute: {thread_id}")
+                logger.info(f"Propagating thread_id baggage: {thread_id}")
             else:
                 logger.warning("No thread_id found in request metadata")
             response = await call_next(request)
             logger.info(f"Request completed, span will be exported")
             return response
     finally:
-        if token:
-            from opentelemetry.context import detach
-            detach(token)
+        detach(token)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvicorn picks uvloop and httptools automatically when installed (uvicorn[standard]).
+    # to_a2a() keeps tasks and sessions in memory per process, so WORKERS > 1 needs
+    # shared session and task stores; otherwise follow-up messages that land on another
+    # worker start an empty session and tasks/get cannot find the task.
+    uvicorn.run(
+        "google_adk.agent:a2a_app",
+        host=os.getenv("HOST", "localhost"),
+        port=8002,
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WORKERS", "1")),
+    )
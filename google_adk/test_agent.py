@@ -7,6 +7,7 @@ Run this script after starting the agent server with:
 
 import asyncio
 import aiohttp
+import orjson
 import json
 
 
@@ -64,7 +65,9 @@ async def test_agent():
     print("Testing Google ADK Calculator Agent")
     print("=" * 60)
     
-    async with aiohttp.ClientSession() as session:
+    async with aiohttp.ClientSession(
+        json_serialize=lambda obj: orjson.dumps(obj).decode()
+    ) as session:
         for i, question in enumerate(test_cases, 1):
             print(f"\n--- Test {i} ---")
             print(f"Question: {question}")
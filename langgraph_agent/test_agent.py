@@ -7,6 +7,7 @@ Run this script after starting the agent server with:
 
 import asyncio
 import aiohttp
+import orjson
 import uuid
 import os
 import sys
@@ -37,7 +38,9 @@ async def test_agent(assistant_id, port=2024):
     print("=" * 60)
     print()
     
-    async with aiohttp.ClientSession() as session:
+    async with aiohttp.ClientSession(
+        json_serialize=lambda obj: orjson.dumps(obj).decode()
+    ) as session:
         for i, question in enumerate(test_cases, 1):
             print(f"--- Test {i} ---")
             print(f"Question: {question}")
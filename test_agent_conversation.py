@@ -14,8 +14,10 @@ Prerequisites:
 2. Start Google ADK agent: uvicorn google_adk.agent:a2a_app --host localhost --port 8002
 """
 
+import argparse
 import asyncio
-import aiohttp
+import httpx
+import msgspec
 import os
 import sys
 import uuid
@@ -23,8 +25,65 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+# Request headers are identical for every call, so build them once
+REQUEST_HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
 
-async def send_to_langchain(session, assistant_id, text, thread_id, context_id=None, task_id=None):
+# Bound in-flight requests across all conversations to what the agents can serve
+REQUEST_LIMITER = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_REQUESTS", "20")))
+
+
+class TextPart(msgspec.Struct):
+    """A2A text part."""
+    text: str
+    kind: str = "text"
+
+
+class Message(msgspec.Struct, omit_defaults=True):
+    """A2A message - contextId and taskId are only sent on follow-up messages."""
+    role: str
+    parts: list[TextPart]
+    messageId: str
+    contextId: str | None = None
+    taskId: str | None = None
+
+
+class MessageSendParams(msgspec.Struct, omit_defaults=True):
+    """Params for message/send - messageId is repeated here only for some implementations."""
+    message: Message
+    messageId: str | None = None
+
+
+class TraceMetadata(msgspec.Struct):
+    """Payload metadata used to group traces into one LangSmith thread."""
+    thread_id: str
+
+
+class MessageSendRequest(msgspec.Struct):
+    """JSON-RPC message/send request."""
+    id: str
+    params: MessageSendParams
+    metadata: TraceMetadata
+    jsonrpc: str = "2.0"
+    method: str = "message/send"
+
+
+# Encoding is schema-driven from the structs above, so reuse one encoder
+json_encoder = msgspec.json.Encoder()
+
+
+def create_client():
+    """Create the HTTP client shared by every request in a test run.
+
+    Both agents run on localhost, so a single keep-alive connection pool is
+    reused across rounds instead of paying a fresh TCP connect per request.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=500, max_keepalive_connections=200),
+        timeout=httpx.Timeout(120.0),
+    )
+
+
+async def send_to_langchain(client, assistant_id, text, thread_id, context_id=None, task_id=None):
     """Send a message to LangChain agent using standard A2A format.
     
     Uses contextId per A2A spec (3.4.2) for multi-turn conversation patterns.
@@ -34,61 +93,51 @@ async def send_to_langchain(session, assistant_id, text, thread_id, context_id=N
     """
     url = f"http://127.0.0.1:2024/a2a/{assistant_id}"
     
-    # Build message object - contextId and taskId go inside the message
-    message = {
-        "role": "user",
-        "parts": [{"kind": "text", "text": text}],
-        "messageId": str(uuid.uuid4())
-    }
+    # One id per message, reused as the JSON-RPC request id
+    message_id = str(uuid.uuid4())
     
-    # Add contextId and taskId inside message for follow-up messages
-    if context_id:
-        message["contextId"] = context_id
-    if task_id:
-        message["taskId"] = task_id
+    # Build message object - contextId and taskId go inside the message for follow-up messages
+    message = Message(
+        role="user",
+        parts=[TextPart(text=text)],
+        messageId=message_id,
+        contextId=context_id or None,
+        taskId=task_id or None,
+    )
     
     # Build params - messageId is also at params level for some implementations
-    params = {
-        "message": message,
-        "messageId": message["messageId"]
-    }
-    
-    payload = {
-        "jsonrpc": "2.0",
-        "id": str(uuid.uuid4()),
-        "method": "message/send",
-        "params": params,
-        "metadata": {
-            "thread_id": thread_id  # Use context_id as thread_id to group traces in same thread
-        }
-    }
+    payload = MessageSendRequest(
+        id=message_id,
+        params=MessageSendParams(message=message, messageId=message_id),
+        # Use context_id as thread_id to group traces in same thread
+        metadata=TraceMetadata(thread_id=thread_id),
+    )
     
-    headers = {"Accept": "application/json"}
     try:
-        async with session.post(url, json=payload, headers=headers) as response:
-            if response.status == 200:
-                result = await response.json()
-                
-                if "error" in result:
-                    return False, result["error"].get("message", "Unknown error"), None, None
-                
-                if "result" not in result:
-                    return False, "Response missing 'result' key", None, None
-                
-                result_obj = result["result"]
-                task_id = result_obj.get("id")
-                context_id = result_obj.get("contextId")
-                response_text = result_obj["artifacts"][0]["parts"][0]["text"]
-                
-                return True, response_text, task_id, context_id
-            else:
-                text = await response.text()
-                return False, f"Error {response.status}: {text[:200]}", None, None
+        async with REQUEST_LIMITER:
+            response = await client.post(url, content=json_encoder.encode(payload), headers=REQUEST_HEADERS)
+        if response.status_code == 200:
+            result = msgspec.json.decode(response.content)
+            
+            if "error" in result:
+                return False, result["error"].get("message", "Unknown error"), None, None
+            
+            if "result" not in result:
+                return False, "Response missing 'result' key", None, None
+            
+            result_obj = result["result"]
+            task_id = result_obj.get("id")
+            context_id = result_obj.get("contextId")
+            response_text = result_obj["artifacts"][0]["parts"][0]["text"]
+            
+            return True, response_text, task_id, context_id
+        else:
+            return False, f"Error {response.status_code}: {response.text[:200]}", None, None
     except Exception as e:
         return False, f"Exception: {str(e)}", None, None
 
 
-async def send_to_google_adk(session, text, thread_id, context_id=None, task_id=None):
+async def send_to_google_adk(client, text, thread_id, context_id=None, task_id=None):
     """Send a message to Google ADK agent using to_a2a() format.
     
     Google ADK to_a2a() expects:
@@ -99,72 +148,62 @@ async def send_to_google_adk(session, text, thread_id, context_id=None, task_id=
     """
     url = "http://localhost:8002/"
     
-    # Build message object - contextId and taskId go inside the message
-    message = {
-        "role": "user",
-        "parts": [{"kind": "text", "text": text}],
-        "messageId": str(uuid.uuid4())
-    }
-    
-    # Add contextId and taskId inside message for follow-up messages
-    if context_id:
-        message["contextId"] = context_id
-    if task_id:
-        message["taskId"] = task_id
+    # One id per message, reused as the JSON-RPC request id
+    message_id = str(uuid.uuid4())
     
-    params = {
-        "message": message
-    }
+    # Build message object - contextId and taskId go inside the message for follow-up messages
+    message = Message(
+        role="user",
+        parts=[TextPart(text=text)],
+        messageId=message_id,
+        contextId=context_id or None,
+        taskId=task_id or None,
+    )
     
-    payload = {
-        "jsonrpc": "2.0",
-        "id": str(uuid.uuid4()),
-        "method": "message/send",
-        "params": params,
-        "metadata": {
-            "thread_id": thread_id  # Use context_id as thread_id to group traces in same thread
-        }
-    }
+    payload = MessageSendRequest(
+        id=message_id,
+        params=MessageSendParams(message=message),
+        # Use context_id as thread_id to group traces in same thread
+        metadata=TraceMetadata(thread_id=thread_id),
+    )
     
-    headers = {"Accept": "application/json"}
     try:
-        async with session.post(url, json=payload, headers=headers) as response:
-            if response.status == 200:
-                result = await response.json()
-                
-                if "error" in result:
-                    return False, result["error"].get("message", "Unknown error"), None, None
-                
-                if "result" not in result:
-                    return False, "Response missing 'result' key", None, None
-                
-                result_obj = result["result"]
-                task_id = result_obj.get("id")
-                context_id = result_obj.get("contextId")
-                response_text = result_obj["artifacts"][0]["parts"][0]["text"]
-                
-                return True, response_text, task_id, context_id
-            else:
-                text = await response.text()
-                return False, f"Error {response.status}: {text[:200]}", None, None
+        async with REQUEST_LIMITER:
+            response = await client.post(
+                url,
+                content=json_encoder.encode(payload),
+                # X-Thread-Id lets the ADK middleware skip parsing the body for metadata
+                headers={**REQUEST_HEADERS, "X-Thread-Id": thread_id},
+            )
+        if response.status_code == 200:
+            result = msgspec.json.decode(response.content)
+            
+            if "error" in result:
+                return False, result["error"].get("message", "Unknown error"), None, None
+            
+            if "result" not in result:
+                return False, "Response missing 'result' key", None, None
+            
+            result_obj = result["result"]
+            task_id = result_obj.get("id")
+            context_id = result_obj.get("contextId")
+            response_text = result_obj["artifacts"][0]["parts"][0]["text"]
+            
+            return True, response_text, task_id, context_id
+        else:
+            return False, f"Error {response.status_code}: {response.text[:200]}", None, None
     except Exception as e:
         return False, f"Exception: {str(e)}", None, None
 
 
-async def simulate_conversation(langchain_assistant_id, num_rounds=5, initial_message=None):
-    """Simulate a conversation between LangChain and Google ADK agents."""
-    
-    if initial_message is None:
-        initial_message = "Repeat this exact message back to me: Hello! I'm a LangChain agent. Can you help me calculate something?"
-    
-    print("=" * 70)
-    print("Agent-to-Agent Conversation Simulation")
-    print("=" * 70)
-    print(f"LangChain Agent: http://127.0.0.1:2024/a2a/{langchain_assistant_id}")
-    print(f"Google ADK Agent: http://localhost:8002/")
-    print("=" * 70)
-    print()
+async def run_conversation(client, langchain_assistant_id, num_rounds, initial_message, parallel=False, prefix=""):
+    """Run one multi-round conversation between the agents over a shared client.
     
+    By default each round is a strict handoff: LangChain answers first and its
+    response is sent on to Google ADK. With parallel=True both agents receive the
+    same message concurrently and the Google ADK response seeds the next round.
+    Output lines are prefixed with prefix so concurrent conversations can be told apart.
+    """
     message = initial_message
     
     # Use context_id as thread_id - both agents share the same value
@@ -173,65 +212,106 @@ async def simulate_conversation(langchain_assistant_id, num_rounds=5, initial_me
     langchain_task_id = None
     adk_task_id = None
     
-    
-    async with aiohttp.ClientSession() as session:
-        for i in range(num_rounds):
-            print(f"--- Round {i + 1} ---")
-            if context_id:
-                print(f"📎 Context ID: {context_id}")
-            if langchain_task_id:
-                print(f"📋 LangChain Task ID: {langchain_task_id}")
-            if adk_task_id:
-                print(f"📋 ADK Task ID: {adk_task_id}")
-            print()
-            
-            thread_id = context_id or shared_thread_id
-            
+    for i in range(num_rounds):
+        print(f"{prefix}--- Round {i + 1} ---")
+        if context_id:
+            print(f"{prefix}📎 Context ID: {context_id}")
+        if langchain_task_id:
+            print(f"{prefix}📋 LangChain Task ID: {langchain_task_id}")
+        if adk_task_id:
+            print(f"{prefix}📋 ADK Task ID: {adk_task_id}")
+        print()
+        
+        thread_id = context_id or shared_thread_id
+        
+        if parallel:
+            # Both agents react to the same message, so the calls are independent
+            print(f"{prefix}📤 Sending to LangChain and Google ADK: {message[:60]}...")
+            langchain_result, adk_result = await asyncio.gather(
+                send_to_langchain(client, langchain_assistant_id, message, thread_id, context_id, None),
+                send_to_google_adk(client, message, thread_id, context_id, None),
+            )
+        else:
             # LangChain agent responds
-            print(f"📤 Sending to LangChain: {message[:60]}...")
-            success, response, new_task_id, new_context_id = await send_to_langchain(
-                session, langchain_assistant_id, message, thread_id, context_id, None
+            print(f"{prefix}📤 Sending to LangChain: {message[:60]}...")
+            langchain_result = await send_to_langchain(
+                client, langchain_assistant_id, message, thread_id, context_id, None
             )
-            
-            if success:
-                print(f"🟡 LangChain Agent: {response}")
-                message = response
-                if new_task_id:
-                    langchain_task_id = new_task_id
-                if new_context_id:
-                    context_id = new_context_id
-                    shared_thread_id = new_context_id
-            else:
-                print(f"❌ LangChain Error: {response}")
-                break
-            
-            print()
-            
+        
+        success, response, new_task_id, new_context_id = langchain_result
+        if success:
+            print(f"{prefix}🟡 LangChain Agent: {response}")
+            message = response
+            if new_task_id:
+                langchain_task_id = new_task_id
+            if new_context_id:
+                context_id = new_context_id
+                shared_thread_id = new_context_id
+        else:
+            print(f"{prefix}❌ LangChain Error: {response}")
+            break
+        
+        print()
+        
+        if not parallel:
             # Google ADK agent responds
             thread_id = context_id or shared_thread_id
-            print(f"📤 Sending to Google ADK: {message[:60]}...")
-            success, response, new_task_id, new_context_id = await send_to_google_adk(
-                session, message, thread_id, context_id, None
+            print(f"{prefix}📤 Sending to Google ADK: {message[:60]}...")
+            adk_result = await send_to_google_adk(
+                client, message, thread_id, context_id, None
             )
-            
-            if success:
-                print(f"🟢 Google ADK Agent: {response}")
-                message = response
-                if new_task_id:
-                    adk_task_id = new_task_id
-                if new_context_id:
-                    context_id = new_context_id
-                    shared_thread_id = new_context_id
-            else:
-                print(f"❌ Google ADK Error: {response}")
-                break
-            
-            print()
-            print("-" * 70)
-            print()
-            
-            # Small delay between rounds
-            await asyncio.sleep(0.5)
+        
+        success, response, new_task_id, new_context_id = adk_result
+        if success:
+            print(f"{prefix}🟢 Google ADK Agent: {response}")
+            message = response
+            if new_task_id:
+                adk_task_id = new_task_id
+            if new_context_id:
+                context_id = new_context_id
+                shared_thread_id = new_context_id
+        else:
+            print(f"{prefix}❌ Google ADK Error: {response}")
+            break
+        
+        print()
+        print("-" * 70)
+        print()
+
+
+async def simulate_conversation(langchain_assistant_id, num_rounds=5, initial_message=None, parallel=False, batch_size=1):
+    """Simulate conversations between LangChain and Google ADK agents.
+    
+    batch_size independent conversations (each with its own thread) run
+    concurrently and share one HTTP client, so an evaluation run costs roughly
+    the wall time of a single conversation instead of batch_size of them.
+    """
+    
+    if initial_message is None:
+        initial_message = "Repeat this exact message back to me: Hello! I'm a LangChain agent. Can you help me calculate something?"
+    
+    print("=" * 70)
+    print("Agent-to-Agent Conversation Simulation")
+    print("=" * 70)
+    print(f"LangChain Agent: http://127.0.0.1:2024/a2a/{langchain_assistant_id}")
+    print(f"Google ADK Agent: http://localhost:8002/")
+    print(f"Mode: {'parallel' if parallel else 'serial'}")
+    print(f"Conversations: {batch_size}")
+    print("=" * 70)
+    print()
+    
+    async with create_client() as client:
+        await asyncio.gather(*(
+            run_conversation(
+                client,
+                langchain_assistant_id,
+                num_rounds,
+                initial_message,
+                parallel=parallel,
+                prefix=f"[{n + 1}] " if batch_size > 1 else "",
+            )
+            for n in range(batch_size)
+        ))
     
     print("=" * 70)
     print("Conversation completed!")
@@ -240,11 +320,42 @@ async def simulate_conversation(langchain_assistant_id, num_rounds=5, initial_me
 
 def main():
     """Main entry point."""
-    # Get LangChain assistant ID from environment or command line
-    langchain_assistant_id = os.getenv("LANGCHAIN_ASSISTANT_ID")
+    parser = argparse.ArgumentParser(
+        description="Simulate a conversation between LangChain and Google ADK agents."
+    )
+    parser.add_argument(
+        "langchain_assistant_id",
+        nargs="?",
+        default=os.getenv("LANGCHAIN_ASSISTANT_ID"),
+        help="LangChain assistant ID (defaults to LANGCHAIN_ASSISTANT_ID)",
+    )
+    parser.add_argument(
+        "num_rounds",
+        nargs="?",
+        type=int,
+        default=int(os.getenv("NUM_ROUNDS", "5")),
+        help="Number of conversation rounds (defaults to NUM_ROUNDS or 5)",
+    )
+    parser.add_argument(
+        "initial_message",
+        nargs="?",
+        default=os.getenv("INITIAL_MESSAGE"),
+        help="Opening message (defaults to INITIAL_MESSAGE)",
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Send each round's message to both agents concurrently",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=int(os.getenv("BATCH_SIZE", "1")),
+        help="Number of independent conversations to run concurrently (defaults to BATCH_SIZE or 1)",
+    )
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1:
-        langchain_assistant_id = sys.argv[1]
+    langchain_assistant_id = args.langchain_assistant_id
     
     if not langchain_assistant_id:
         print("Error: LangChain assistant ID is required")
@@ -260,25 +371,20 @@ def main():
         print("  2. Copy the assistant_id from the output")
         sys.exit(1)
     
-    # Get number of rounds (optional)
-    num_rounds = int(os.getenv("NUM_ROUNDS", "5"))
-    if len(sys.argv) > 2:
-        num_rounds = int(sys.argv[2])
-    
-    # Get initial message (optional)
-    initial_message = os.getenv("INITIAL_MESSAGE")
-    if len(sys.argv) > 3:
-        initial_message = sys.argv[3]
+    num_rounds = args.num_rounds
     
     print("Starting conversation simulation...")
     print(f"LangChain Assistant ID: {langchain_assistant_id}")
     print(f"Number of rounds: {num_rounds}")
+    print(f"Batch size: {args.batch_size}")
     print()
     
     asyncio.run(simulate_conversation(
         langchain_assistant_id,
         num_rounds=num_rounds,
-        initial_message=initial_message
+        initial_message=args.initial_message,
+        parallel=args.parallel,
+        batch_size=args.batch_size,
     ))
 
 
@@ -2,6 +2,7 @@
 
 This module provides custom OpenTelemetry components for:
 - Modifying span attributes before export
+- Copying thread_id from W3C baggage onto every span
 - Filtering spans based on regex patterns
 - Restructuring traces by reparenting spans when parents are filtered
 """
@@ -11,7 +12,9 @@ import re
 import logging
 from typing import Sequence, Dict, Optional
 
-from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry import baggage
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span
 from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult, SpanProcessor
 
 logger = logging.getLogger(__name__)
@@ -77,6 +80,29 @@ class TraceModifyingSpanProcessor(SpanProcessor):
         pass
 
 
+class ThreadIdBaggageSpanProcessor(SpanProcessor):
+    """Span processor that tags spans with the thread_id carried in W3C baggage.
+    
+    The thread_id is set as baggage once at ingress; every span started under
+    that context (agent, tool and LLM spans alike) then gets the
+    langsmith.metadata.thread_id attribute used to group traces into threads.
+    """
+    
+    def on_start(self, span: Span, parent_context: Optional[Context] = None):
+        """Called when a span starts. Copy thread_id from baggage onto the span."""
+        thread_id = baggage.get_baggage("thread_id", parent_context)
+        if thread_id:
+            span.set_attribute("langsmith.metadata.thread_id", str(thread_id))
+    
+    def shutdown(self):
+        """Shutdown the processor."""
+        pass
+    
+    def force_flush(self, timeout_millis: int = 30000):
+        """Force flush the processor."""
+        return True
+
+
 def should_filter_span(span: ReadableSpan, filter_patterns: list[re.Pattern]) -> bool:
     """Check if a span should be filtered out based on regex patterns.
     